@@ -1,47 +1,282 @@
-from copy import deepcopy
-from typing import Dict, List, Optional, Tuple
+from functools import lru_cache
+from itertools import product
+from math import factorial
+from operator import mul
+from typing import List, Tuple
 
-from camelcalc.camelup import Color, Game, LegBetCard
+from camelcalc.camelup import (
+    BOARD_SPOTS,
+    CAMEL_MASK,
+    CAMEL_SHIFTS,
+    CARD_FORWARD,
+    CARD_NONE,
+    COLOR_BITS,
+    COLOR_MASK,
+    FINISHED_BIT,
+    BoardState,
+    Color,
+    Game,
+    MovementCards,
+    positions_from_state,
+    simulate_move,
+    simulate_rolls,
+    spots_from_state,
+)
 
 
-def generate_outcomes(game: Game) -> List[Game]:
+# The color indices of the die in each possible bitmask of die
+DIE_COLORS: Tuple[Tuple[int, ...], ...] = tuple(
+    tuple(c for c in range(len(Color)) if mask & (1 << c))
+    for mask in range(1 << len(Color))
+)
+
+
+def is_order_independent(
+    state: BoardState, die_mask: int, movement_cards: MovementCards
+) -> bool:
+    """
+    Can the die in `die_mask` be rolled in any order without
+    changing the final board? This is the case when no rolling camel
+    can reach a spot another rolling camel can reach, land on a
+    movement card, or finish the race
+    """
+
+    spots = spots_from_state(state)
+    rolling = sorted(spots[c] for c in DIE_COLORS[die_mask])
+    for pos, next_pos in zip(rolling, rolling[1:]):
+        if next_pos - pos <= 3:
+            return False
+    for pos in rolling:
+        if pos + 3 > BOARD_SPOTS:
+            return False
+        for spot in range(pos + 1, pos + 4):
+            if movement_cards[spot] != CARD_NONE:
+                return False
+    return True
+
+
+def are_leaders_decided(
+    state: BoardState, die_mask: int, movement_cards: MovementCards
+) -> bool:
+    """
+    Can none of the die in `die_mask` change which camels finish first
+    and second? This is the case when neither of them has a die left,
+    and the camel in third couldn't reach the spot of the camel in
+    second even if it was carried by every die
+    """
+
+    first = (state >> CAMEL_SHIFTS[-1]) & CAMEL_MASK
+    second = (state >> CAMEL_SHIFTS[-2]) & CAMEL_MASK
+    if die_mask & (1 << (first & COLOR_MASK) | 1 << (second & COLOR_MASK)):
+        return False
+
+    # Each die carries a camel at most 3 spots, or 4 if it
+    # lands on a forward movement card
+    step = 4 if CARD_FORWARD in movement_cards else 3
+    third = (state >> CAMEL_SHIFTS[-3]) & CAMEL_MASK
+    reach = step * len(DIE_COLORS[die_mask])
+    return (third >> COLOR_BITS) + reach < second >> COLOR_BITS
+
+
+def expand_outcomes(
+    state: BoardState, die_mask: int, movement_cards: MovementCards
+) -> List[BoardState]:
+    """
+    Given a board state and the die remaining this leg, generate
+    and return a list of all possible final board states
+    """
+
+    # Walk the tree depth first with an explicit stack. Boards are
+    # immutable, so backtracking is just popping the stack
+    outcomes: List[BoardState] = []
+    stack: List[Tuple[BoardState, int]] = [(state, die_mask)]
+    while len(stack) > 0:
+        state, die_mask = stack.pop()
+        if die_mask == 0:
+            outcomes.append(state)
+            continue
+        for color in DIE_COLORS[die_mask]:
+            remaining = die_mask & ~(1 << color)
+            for outcome in simulate_rolls(state, movement_cards, color):
+                stack.append((outcome, remaining))
+    return outcomes
+
+
+# The number of outcomes in which each camel finishes first, second,
+# and third or worse (leg bets pay out the same for every place from
+# third on), tallied in a single int with a COUNT_BITS wide lane per
+# camel and place (see `count_shift`). This lets the counts of two
+# subtrees be merged with a single addition. A leg has at most
+# 5! * 3^5 outcomes, which comfortably fits in a lane
+PlaceCounts = int
+
+COUNT_BITS = 20
+COUNT_MASK = (1 << COUNT_BITS) - 1
+COUNTED_PLACES = 3
+
+# The number of outcomes of rolling each number of die
+OUTCOMES: Tuple[int, ...] = tuple(factorial(k) * 3 ** k for k in range(len(Color) + 1))
+
+
+def count_shift(color: int, place: int) -> int:
+    """
+    Returns the offset of the lane counting how often the
+    camel with color index `color` finishes in `place` place
+    (with every place from third on counted as third)
+    """
+
+    return COUNT_BITS * (color * COUNTED_PLACES + min(place, COUNTED_PLACES) - 1)
+
+
+# A count of one in the lane of each camel and place (first through
+# fifth, indexed from 1)
+COUNT_ONES: Tuple[Tuple[int, ...], ...] = tuple(
+    tuple(1 << count_shift(c, place) if place > 0 else 0 for place in range(6))
+    for c in range(len(Color))
+)
+
+
+def unpack_counts(counts: PlaceCounts) -> List[List[int]]:
+    """
+    Unpacks place counts into a list (indexed by `Color.idx`) of the
+    number of times each camel finishes first, second, and third or worse
+    """
+
+    return [
+        [
+            (counts >> count_shift(c, place)) & COUNT_MASK
+            for place in range(1, COUNTED_PLACES + 1)
+        ]
+        for c in range(len(Color))
+    ]
+
+
+def place_counts(state: BoardState) -> PlaceCounts:
+    """
+    Returns the place counts of the single outcome `state`
+    """
+
+    counts = 0
+    for c, place in enumerate(positions_from_state(state)):
+        counts |= COUNT_ONES[c][place]
+    return counts
+
+
+# Bounded so that a long session can't grow the cache without limit.
+# A fresh leg visits roughly 5,000 distinct boards
+@lru_cache(maxsize=100_000)
+def count_places(
+    state: BoardState, die_mask: int, movement_cards: MovementCards
+) -> PlaceCounts:
+    """
+    Given a board state and the die remaining this leg (as a bitmask),
+    count the number of outcomes in which each camel finishes first,
+    second, and third or worse. Results are cached, since different
+    roll orders often reach the same board
+    """
+
+    # Once the remaining die can't change the leaders (or the race is
+    # over, so they can't move anything), every outcome of this subtree
+    # pays out the same as the current board
+    if (
+        die_mask == 0
+        or state & FINISHED_BIT
+        or are_leaders_decided(state, die_mask, movement_cards)
+    ):
+        return place_counts(state) * OUTCOMES[len(DIE_COLORS[die_mask])]
+
+    # With a single die left, every roll ends the leg, so the boards it
+    # reaches are tallied directly rather than through the cache
+    rolled = DIE_COLORS[die_mask]
+    if len(rolled) == 1:
+        totals = 0
+        for outcome in simulate_rolls(state, movement_cards, rolled[0]):
+            totals += place_counts(outcome)
+        return totals
+
+    # If roll order doesn't matter, rolling any single die next is
+    # enough, as long as it stands in for every die that could be next
+    weight = 1
+    if is_order_independent(state, die_mask, movement_cards):
+        weight = len(rolled)
+        rolled = rolled[:1]
+    totals = 0
+    for color in rolled:
+        remaining = die_mask & ~(1 << color)
+        # Different rolls can reach the same board (say, by landing on
+        # a forward movement card or crossing the finish line), so each
+        # distinct board is counted once and weighted by its rolls
+        first, second, third = simulate_rolls(state, movement_cards, color)
+        if first == second == third:
+            totals += 3 * count_places(first, remaining, movement_cards)
+        elif first == second:
+            totals += 2 * count_places(first, remaining, movement_cards)
+            totals += count_places(third, remaining, movement_cards)
+        elif second == third:
+            totals += count_places(first, remaining, movement_cards)
+            totals += 2 * count_places(second, remaining, movement_cards)
+        else:
+            totals += count_places(first, remaining, movement_cards)
+            totals += count_places(second, remaining, movement_cards)
+            totals += count_places(third, remaining, movement_cards)
+    return totals * weight
+
+
+def generate_outcomes(game: Game) -> List[BoardState]:
     """
     Given a game, generate and return a list of
-    all possible roll outcomes
+    all possible roll outcomes. Each outcome in the
+    list is equally likely
     """
 
-    # Note: using a list to return the possible games is actually
-    # faster than using a DoublyLinkedList
-    if len(game.die_remaining) == 0:
-        return [game]
+    # Note: outcomes are simulated on immutable board snapshots,
+    # which is much faster than deepcopying the game for each roll
+    state, die_mask, movement_cards = game.canonical_key()
+    if not is_order_independent(state, die_mask, movement_cards):
+        return expand_outcomes(state, die_mask, movement_cards)
+
+    # Every order of the die leads to the same boards (each equally
+    # likely), so rolling the die in a single order is enough
+    die_order = DIE_COLORS[die_mask]
     outcomes = []
-    for color in game.die_remaining:
-        for roll in range(1, 4):
-            g = deepcopy(game)
-            g.move_camel(color, roll)
-            g.die_remaining.discard(color)
-            outcomes.extend(generate_outcomes(g))
+    for rolls in product(range(1, 4), repeat=len(die_order)):
+        outcome = state
+        for color, roll in zip(die_order, rolls):
+            outcome = simulate_move(outcome, movement_cards, color, roll)
+        outcomes.append(outcome)
     return outcomes
 
 
+def build_payoff_table(game: Game) -> List[List[int]]:
+    """
+    Build a table (indexed by `Color.idx`) of the payoff of each camel's top
+    leg bet card if it finishes first, second, and third or worse (matching
+    `PlaceCounts`). Camels with no leg bet cards remaining pay nothing
+    """
+
+    places = range(1, COUNTED_PLACES + 1)
+    table: List[List[int]] = []
+    for c in Color:
+        cards = game.leg_bet_cards[c]
+        if len(cards) > 0:
+            table.append([cards[0].get_payoff(place) for place in places])
+        else:
+            table.append([0] * COUNTED_PLACES)
+    return table
+
+
 def calculate_best_leg_bet(game: Game) -> Tuple[Color, float]:
     """
     Determine which camel is the best option to make a
     leg bet on given the current game
     """
 
-    expected_payoffs: Dict[Color, int] = {c: 0 for c in Color}
-    payoffs: Dict[Color, Optional[LegBetCard]] = {
-        c: game.leg_bet_cards[c][0] if len(game.leg_bet_cards[c]) > 0 else None
-        for c in game.leg_bet_cards
-    }
-    outcomes: List[Game] = generate_outcomes(game)
-    for outcome in outcomes:
-        positions = outcome.get_positions()
-        for c in Color:
-            payoff = payoffs[c]
-            if payoff is not None:
-                expected_payoffs[c] += payoff.get_payoff(positions[c])
-    best_bet: Color = max(expected_payoffs, key=expected_payoffs.get)  # type: ignore[type-var]
-    expected_payoff = expected_payoffs[best_bet] / len(outcomes)
+    payoff_table = build_payoff_table(game)
+    counts = unpack_counts(count_places(*game.canonical_key()))
+    expected_payoffs: List[int] = [
+        sum(map(mul, payoffs, camel_counts))
+        for payoffs, camel_counts in zip(payoff_table, counts)
+    ]
+    best_bet: Color = max(Color, key=lambda c: expected_payoffs[c.idx])
+    expected_payoff = expected_payoffs[best_bet.idx] / sum(counts[0])
     return (best_bet, expected_payoff)
@@ -1,8 +1,9 @@
+from bisect import bisect_left
 from enum import Enum, auto
+from functools import lru_cache
 from random import randint
-from typing import Dict, List, Optional, Set, Tuple
+from typing import AbstractSet, Dict, List, Optional, Set, Tuple
 
-from camelcalc.linkedlist import DoublyLinkedList, Node
 from camelcalc.utils import multiline_concat_list, to_string
 
 
@@ -37,10 +38,19 @@ class Color(Enum):
     YELLOW = "yellow"
     WHITE = "white"
 
+    idx: int
+
     def __str__(self) -> str:
         return self.name.capitalize()
 
 
+# Index of each color in definition order, used to index
+# lists of per-camel values in the calculator's hot paths
+for i, color in enumerate(Color):
+    color.idx = i
+del i, color
+
+
 class TeamName(Enum):
     """
     Enum defining the different team names
@@ -60,6 +70,8 @@ class TeamName(Enum):
 
 
 class Camel:
+    __slots__ = ("color", "pos")
+
     color: Color
     pos: int
 
@@ -76,8 +88,11 @@ class Camel:
 
 
 class LegBetCard:
+    __slots__ = ("color", "max_payoff", "_payoffs")
+
     color: Color
     max_payoff: int
+    _payoffs: Tuple[int, ...]
 
     def __init__(self, color: Color, max_payoff: int) -> None:
         """
@@ -87,6 +102,8 @@ class LegBetCard:
 
         self.color = color
         self.max_payoff = max_payoff
+        # Payoff for each place (first through fifth, indexed from 1)
+        self._payoffs = (0, max_payoff, 1, -1, -1, -1)
 
     def get_payoff(self, place: int) -> int:
         """
@@ -94,18 +111,15 @@ class LegBetCard:
         `place` place, return the payoff of this bet.
         """
 
-        if place == 1:
-            return self.max_payoff
-        elif place == 2:
-            return 1
-        else:
-            return -1
+        return self._payoffs[place]
 
     def __str__(self) -> str:
         return f"{self.color}: max {self.max_payoff}"
 
 
 class MovementCard:
+    __slots__ = ("team", "forward")
+
     team: TeamName
     forward: bool
 
@@ -137,6 +151,14 @@ def generate_initial_leg_bet_cards() -> Dict[Color, List[LegBetCard]]:
 
 
 class Team:
+    __slots__ = (
+        "name",
+        "coins",
+        "leg_bet_cards",
+        "placed_movement_card",
+        "overall_bets_made",
+    )
+
     name: TeamName
     coins: int
     leg_bet_cards: Set[LegBetCard]
@@ -171,24 +193,220 @@ class Team:
 
 
 class Spot:
+    __slots__ = ("position", "camels", "movement_card")
+
     position: int
-    camels: DoublyLinkedList[Camel]
+    camels: List[Color]
     movement_card: Optional[MovementCard]
 
     def __init__(self, position: int) -> None:
         """
-        Represents a spot that a camel (or multiple camels) can occupy
+        Represents a spot that a camel (or multiple camels) can occupy.
+        `camels` is ordered from the bottom of the stack to the top
         """
 
         self.position = position
-        self.camels = DoublyLinkedList()
+        self.camels = []
         self.movement_card = None
 
     def __str__(self) -> str:
         movement_card_string = (
             "" if self.movement_card is None else str(self.movement_card)
         )
-        return f"{self.camels}\n{self.position}\n{movement_card_string}"
+        camels_string = "\n".join(reversed(to_string(self.camels)))
+        return f"{camels_string}\n{self.position}\n{movement_card_string}"
+
+
+# Boards are simulated as a single int (see `Game.snapshot`), so a
+# board can be copied and hashed for free. The low CAMELS_BITS bits
+# hold each camel as its color index plus its spot shifted by
+# COLOR_BITS, ordered from the bottom of the rearmost stack to the
+# top of the frontmost, and the next bit marks a finished race
+BoardState = int
+
+# Movement cards can't be placed or removed while simulating a leg,
+# so every simulated board shares a single tuple of the card (one of
+# the CARD_* values) on each spot (see `Game.get_movement_cards`)
+MovementCards = Tuple[int, ...]
+
+COLOR_BITS = 3
+COLOR_MASK = (1 << COLOR_BITS) - 1
+CAMEL_BITS = COLOR_BITS + 4
+CAMEL_MASK = (1 << CAMEL_BITS) - 1
+CAMEL_SHIFTS = tuple(range(0, CAMEL_BITS * len(Color), CAMEL_BITS))
+CAMELS_BITS = CAMEL_BITS * len(Color)
+CARD_NONE = 0
+CARD_FORWARD = 1
+CARD_BACKWARD = 2
+FINISHED_BIT = 1 << CAMELS_BITS
+
+
+def pack_camels(camels: List[int]) -> int:
+    """
+    Packs a list of camels (as their color index plus their spot
+    shifted by COLOR_BITS) ordered from the back of the race
+    """
+
+    packed = 0
+    for camel, shift in zip(camels, CAMEL_SHIFTS):
+        packed |= camel << shift
+    return packed
+
+
+def pack_die(die: AbstractSet[Color]) -> int:
+    """
+    Packs a set of die into a bitmask of their color indices
+    """
+
+    mask = 0
+    for color in die:
+        mask |= 1 << color.idx
+    return mask
+
+
+def spots_from_state(state: BoardState) -> List[int]:
+    """
+    Returns the spot of each camel, indexed by `Color.idx`
+    """
+
+    spots = [0] * len(Color)
+    for shift in CAMEL_SHIFTS:
+        camel = (state >> shift) & CAMEL_MASK
+        spots[camel & COLOR_MASK] = camel >> COLOR_BITS
+    return spots
+
+
+def positions_from_state(state: BoardState) -> List[int]:
+    """
+    Returns the position (first through fifth) of
+    each camel, indexed by `Color.idx`
+    """
+
+    positions = [0] * len(Color)
+    place = len(Color)
+    for shift in CAMEL_SHIFTS:
+        positions[(state >> shift) & COLOR_MASK] = place
+        place -= 1
+    return positions
+
+
+def landing_spot(
+    pos: int, spots: int, movement_cards: MovementCards
+) -> Tuple[int, bool, bool]:
+    """
+    Returns the spot a camel on `pos` moving `spots` number of spots lands
+    on after any movement card, whether it lands on top of the camels
+    already there, and whether it crossed the finish line
+    """
+
+    new_pos = pos + spots
+    if new_pos > BOARD_SPOTS:
+        # Like `Game.move_camel`, the camel first moves onto the last spot,
+        # taking any backward movement card there, and then the race ends
+        if pos < BOARD_SPOTS and movement_cards[BOARD_SPOTS] == CARD_BACKWARD:
+            return (BOARD_SPOTS - 1, False, True)
+        return (BOARD_SPOTS, True, True)
+
+    # Handle additional movement card movement
+    movement_card = movement_cards[new_pos]
+    if movement_card == CARD_FORWARD:
+        new_pos += 1
+        if new_pos > BOARD_SPOTS:
+            return (BOARD_SPOTS, True, True)
+    elif movement_card == CARD_BACKWARD:
+        return (new_pos - 1, False, False)
+    return (new_pos, True, False)
+
+
+@lru_cache(maxsize=1024)
+def landing_spots(
+    pos: int, movement_cards: MovementCards
+) -> Tuple[Tuple[int, bool, bool], ...]:
+    """
+    Returns `landing_spot` for each possible roll of the die (1 through 3).
+    Cached, since the movement cards don't change during a leg
+    """
+
+    return tuple(landing_spot(pos, spots, movement_cards) for spots in range(1, 4))
+
+
+def place_chunk(
+    camels: List[int], chunk: List[int], new_pos: int, on_top: bool, finished: bool
+) -> BoardState:
+    """
+    Returns the board state after moving the packed camels in `chunk` to
+    `new_pos` in `camels` (the packed camels not in `chunk`)
+    """
+
+    chunk = [camel & COLOR_MASK | new_pos << COLOR_BITS for camel in chunk]
+
+    # Camels moving forward end up on top of any camels already on
+    # the spot, and camels moving backward end up underneath them
+    if on_top:
+        insert = bisect_left(camels, (new_pos + 1) << COLOR_BITS)
+    else:
+        insert = bisect_left(camels, new_pos << COLOR_BITS)
+    state = pack_camels(camels[:insert] + chunk + camels[insert:])
+    return state | FINISHED_BIT if finished else state
+
+
+def split_stack(state: BoardState, color: int) -> Tuple[List[int], List[int], int]:
+    """
+    Splits the packed camels of a board state into those that move with the
+    camel with color index `color` (it and the camels on top of it) and those
+    that don't, and returns both along with the spot of the moving camels
+    """
+
+    camels = [(state >> shift) & CAMEL_MASK for shift in CAMEL_SHIFTS]
+    index = 0
+    while camels[index] & COLOR_MASK != color:
+        index += 1
+    pos = camels[index] >> COLOR_BITS
+
+    # Packed camels are ordered by spot, and every camel on spot `s`
+    # falls in [s << COLOR_BITS, (s + 1) << COLOR_BITS), so stacks can
+    # be found by bisecting instead of scanning
+    end = bisect_left(camels, (pos + 1) << COLOR_BITS, index)
+    chunk = camels[index:end]
+    del camels[index:end]
+    return (camels, chunk, pos)
+
+
+def simulate_move(
+    state: BoardState, movement_cards: MovementCards, color: int, spots: int
+) -> BoardState:
+    """
+    Given a board state and the movement cards on the board, return the
+    board state after the camel with color index `color` rolls `spots`
+    (which can't be negative). Follows the same rules as `Game.move_camel`
+    does for a roll, except that once a camel crosses the finish line the
+    board is frozen
+    """
+
+    if spots < 0:
+        raise ValueError("spots must be non-negative")
+    if spots == 0 or state & FINISHED_BIT:
+        return state
+    camels, chunk, pos = split_stack(state, color)
+    return place_chunk(camels, chunk, *landing_spot(pos, spots, movement_cards))
+
+
+def simulate_rolls(
+    state: BoardState, movement_cards: MovementCards, color: int
+) -> List[BoardState]:
+    """
+    Same as `simulate_move`, but returns the board state after each possible
+    roll of the die (1 through 3). Finding the moving camels is shared
+    between the rolls, which makes this cheaper than three separate moves
+    """
+
+    if state & FINISHED_BIT:
+        return [state] * 3
+    camels, chunk, pos = split_stack(state, color)
+    return [
+        place_chunk(camels, chunk, new_pos, on_top, finished)
+        for new_pos, on_top, finished in landing_spots(pos, movement_cards)
+    ]
 
 
 def generate_initial_board() -> Tuple[List[Spot], Dict[Color, Camel]]:
@@ -204,11 +422,13 @@ def generate_initial_board() -> Tuple[List[Spot], Dict[Color, Camel]]:
         roll = roll_dice() - 1
         camel = Camel(c, roll)
         camels[c] = camel
-        spots[roll].camels.insert_single_head(camel)
+        spots[roll].camels.insert(0, c)
     return spots, camels
 
 
 class OverallBetCard:
+    __slots__ = ("color", "team")
+
     color: Color
     team: TeamName
 
@@ -218,6 +438,22 @@ class OverallBetCard:
 
 
 class Game:
+    __slots__ = (
+        "teams",
+        "active_team",
+        "die_remaining",
+        "camels",
+        "spots",
+        "leg_bet_cards",
+        "overall_winner_cards",
+        "overall_loser_cards",
+        "playing",
+        "winners",
+        "_board_dirty",
+        "_cached_board",
+        "_cached_positions",
+    )
+
     teams: Dict[TeamName, Team]
     active_team: TeamName
     die_remaining: Set[Color]
@@ -228,6 +464,9 @@ class Game:
     overall_loser_cards: List[OverallBetCard]
     playing: bool
     winners: Optional[Set[TeamName]]
+    _board_dirty: bool
+    _cached_board: BoardState
+    _cached_positions: List[int]
 
     def __init__(self, number_of_teams: int = 8) -> None:
         """
@@ -244,19 +483,18 @@ class Game:
         self.overall_loser_cards = []
         self.playing = True
         self.winners = None
+        self._board_dirty = True
+        self._cached_board = 0
+        self._cached_positions = []
 
     def __str__(self) -> str:
         current_team_string = f"Current Team: {self.active_team.name}"
         die_remaining_string_literal = ", ".join(to_string(self.die_remaining))
         die_remaining_string = f"Die remaining this leg: {die_remaining_string_literal}"
-        leg_bet_cards_remaining = list(
-            map(
-                lambda c: str(self.leg_bet_cards[c][0])
-                if len(self.leg_bet_cards[c]) > 0
-                else f"{c}: None",
-                self.leg_bet_cards,
-            )
-        )
+        leg_bet_cards_remaining = [
+            str(cards[0]) if len(cards) > 0 else f"{c}: None"
+            for c, cards in self.leg_bet_cards.items()
+        ]
         leg_bet_cards_string_literal = "\n".join(leg_bet_cards_remaining)
         leg_bet_cards_string = (
             f"Leg Bet cards remaining:\n{leg_bet_cards_string_literal}"
@@ -304,7 +542,7 @@ class Game:
         payoffs = [8, 5, 3, 2, 1]
         index = 0
         for card in self.overall_winner_cards:
-            if positions[card.color] == 1:
+            if positions[card.color.idx] == 1:
                 if index < len(payoffs):  # Only first 5 correct bets receive money
                     self.teams[card.team].coins += payoffs[index]
                     index += 1
@@ -312,7 +550,7 @@ class Game:
                 self.teams[card.team].coins -= 1
         index = 0
         for card in self.overall_loser_cards:
-            if positions[card.color] == 5:
+            if positions[card.color.idx] == 5:
                 if index < len(payoffs):  # Only first 5 correct bets receive money
                     self.teams[card.team].coins += payoffs[index]
                     index += 1
@@ -326,15 +564,13 @@ class Game:
         # Mark game as finished
         self.playing = False
 
-    def update_camel_positions(self, node: Node[Camel], new_pos: int) -> None:
+    def update_camel_positions(self, colors: List[Color], new_pos: int) -> None:
         """
-        Update camel position pointers after they move
+        Update camel positions after they move
         """
 
-        curr: Optional[Node[Camel]] = node
-        while curr is not None:
-            curr.data.pos = new_pos
-            curr = curr.next
+        for color in colors:
+            self.camels[color].pos = new_pos
 
     def move_camel(self, color: Color, spots: int) -> None:
         """
@@ -344,27 +580,23 @@ class Game:
         if spots == 0:
             return
         camel = self.camels[color]
-        spot = self.spots[camel.pos]
-        temp_node = spot.camels.head
-        while temp_node is not None and temp_node.data != camel:
-            temp_node = temp_node.next
-        camel_node = temp_node
-        assert camel_node is not None  # Force not None in mypy
-        top_camel = spot.camels.tail
-        assert top_camel is not None  # Force not None in mypy
+        stack = self.spots[camel.pos].camels
+        index = stack.index(color)
         new_pos = camel.pos + spots
         if spots > 0:
             if new_pos > BOARD_SPOTS:
                 self.move_camel(color, BOARD_SPOTS - camel.pos)
                 self.finish_game()
                 return
-            self.update_camel_positions(camel_node, new_pos)
-            spot.camels.remove_chain(camel_node)
-            self.spots[new_pos].camels.insert_chain_tail(camel_node, top_camel)
+            chunk = stack[index:]
+            del stack[index:]
+            self.spots[new_pos].camels.extend(chunk)
         else:
-            self.update_camel_positions(camel_node, new_pos)
-            spot.camels.remove_chain(camel_node)
-            self.spots[new_pos].camels.insert_chain_head(camel_node, top_camel)
+            chunk = stack[index:]
+            del stack[index:]
+            self.spots[new_pos].camels[0:0] = chunk
+        self.update_camel_positions(chunk, new_pos)
+        self._board_dirty = True
 
         # Handle additional movement card movement
         movement_card = self.spots[new_pos].movement_card
@@ -373,23 +605,70 @@ class Game:
             offset = 1 if movement_card.forward else -1
             self.move_camel(color, offset)
 
-    def get_positions(self) -> Dict[Color, int]:
+    def update_board_cache(self) -> None:
         """
-        Returns a dictionary of camel color to position
-        (first through fifth)
+        Pack the board into a single flat int (see `BoardState`) and
+        derive the positions from it. Both are cached until a camel moves
         """
 
-        place: int = 1
-        index: int = 15
-        results: Dict[Color, int] = {}
-        while place < 6:
-            curr: Optional[Node[Camel]] = self.spots[index].camels.tail
-            while curr is not None:
-                results[curr.data.color] = place
-                place += 1
-                curr = curr.prev
-            index -= 1
-        return results
+        camels = [
+            color.idx | spot.position << COLOR_BITS
+            for spot in self.spots
+            for color in spot.camels
+        ]
+        self._cached_board = pack_camels(camels)
+        self._cached_positions = positions_from_state(self._cached_board)
+        self._board_dirty = False
+
+    def get_positions(self) -> List[int]:
+        """
+        Returns the position (first through fifth) of each camel,
+        indexed by `Color.idx`. The list is cached until a camel
+        moves, so it should not be modified
+        """
+
+        if self._board_dirty:
+            self.update_board_cache()
+        return self._cached_positions
+
+    def snapshot(self) -> BoardState:
+        """
+        Returns an immutable snapshot of the current board
+        """
+
+        if self._board_dirty:
+            self.update_board_cache()
+        state = self._cached_board
+        return state | FINISHED_BIT if not self.playing else state
+
+    def canonical_key(self) -> Tuple[BoardState, int, MovementCards]:
+        """
+        Returns a hashable key of everything that decides how the rest
+        of the leg can play out: the board, the die remaining (as a
+        bitmask), and the movement cards. Which team placed a movement
+        card doesn't change where camels end up, so it is left out
+        """
+
+        return (
+            self.snapshot(),
+            pack_die(self.die_remaining),
+            self.get_movement_cards(),
+        )
+
+    def get_movement_cards(self) -> MovementCards:
+        """
+        Returns the movement card (one of the CARD_* values) on each spot
+        """
+
+        cards: List[int] = []
+        for spot in self.spots:
+            if spot.movement_card is None:
+                cards.append(CARD_NONE)
+            elif spot.movement_card.forward:
+                cards.append(CARD_FORWARD)
+            else:
+                cards.append(CARD_BACKWARD)
+        return tuple(cards)
 
     def finish_leg(self) -> None:
         """
@@ -403,7 +682,7 @@ class Game:
         positions = self.get_positions()
         for team in self.teams.values():
             for card in team.leg_bet_cards:
-                team.coins += card.get_payoff(positions[card.color])
+                team.coins += card.get_payoff(positions[card.color.idx])
             team.leg_bet_cards.clear()
 
         # Reset the leg bet cards
@@ -460,7 +739,7 @@ class Game:
             return False
 
         # Can only place a movement card if the spot is empty
-        if self.spots[position].camels.head is not None:
+        if len(self.spots[position].camels) > 0:
             return False
         return True
 
@@ -30,6 +30,7 @@ class Command:
     keywords: Tuple[str, ...]
     commands: List["Command"] = []
     HELP_PADDING: int = 36
+    HELP_TEMPLATE: str = "%%-%ds%%s Alias %%s" % HELP_PADDING
 
     def __init__(self, keywords: List[str]) -> None:
         self.keywords = tuple(keywords)
@@ -45,7 +46,7 @@ class Command:
 
     def help_text_builder(self, command: str, description: str) -> str:
         command_string = f"{command}:"
-        return f"{command_string:<{Command.HELP_PADDING}}{description} Alias {self.keywords[1]}"
+        return Command.HELP_TEMPLATE % (command_string, description, self.keywords[1])
 
 
 class HelpCommand(Command):
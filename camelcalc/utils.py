@@ -1,60 +1,165 @@
-from functools import reduce
-from typing import Iterable, TypeVar
+from functools import lru_cache
+from typing import Iterable, List, NamedTuple, Tuple, TypeVar
 
 
 T = TypeVar("T")
 
 
 def multiline_concat(
-    s1: str, s2: str, merge_from_bottom: bool = True, sep: str = "    "
+    s1: str,
+    s2: str,
+    merge_from_bottom: bool = True,
+    sep: str = "    ",
+    pad_last: bool = True,
 ) -> str:
     """
     Horizontally joins two multiline strings using seperator `sep`
-    with proper spacing. Used to join two "column" of data
+    with proper spacing. Used to join two "column" of data. If `s2`
+    is the last column, `pad_last` can be turned off to leave its
+    lines unpadded instead of ending them with trailing whitespace
     """
 
     s1_split = s1.split("\n")
     s2_split = s2.split("\n")
 
-    # Pad number of lines in each string to ensure they're equal
+    # Measure each string once. Padding lines are empty, so they
+    # don't change the widest line
     s1_split_length = len(s1_split)
     s2_split_length = len(s2_split)
-    s1_fixed_length = [
-        "" for _ in range(max(s1_split_length, s2_split_length) - s1_split_length)
-    ]
-    s2_fixed_length = [
-        "" for _ in range(max(s1_split_length, s2_split_length) - s2_split_length)
-    ]
-
-    # Determine merge order
-    if merge_from_bottom:
-        s1_fixed_length.extend(s1_split)
-        s2_fixed_length.extend(s2_split)
-    else:
-        s1_split.extend(s1_fixed_length)
-        s2_split.extend(s2_fixed_length)
+    s1_length_max = max(map(len, s1_split))
+    s2_length_max = max(map(len, s2_split)) if pad_last else 0
+
+    # Pad number of lines in each string to ensure they're equal, with
+    # a single shared blank line already as wide as the string
+    height = max(s1_split_length, s2_split_length)
+    if s1_split_length == s2_split_length:
         s1_fixed_length = s1_split
         s2_fixed_length = s2_split
+    else:
+        s1_blank = " " * s1_length_max
+        s2_blank = " " * s2_length_max
+        s1_fixed_length = [s1_blank] * (height - s1_split_length)
+        s2_fixed_length = [s2_blank] * (height - s2_split_length)
+
+        # Determine merge order
+        if merge_from_bottom:
+            s1_fixed_length.extend(s1_split)
+            s2_fixed_length.extend(s2_split)
+        else:
+            s1_split.extend(s1_fixed_length)
+            s2_split.extend(s2_fixed_length)
+            s1_fixed_length = s1_split
+            s2_fixed_length = s2_split
 
-    # Pad each individual string within each column to ensure they're equal
-    s1_length_max = max(len(s) for s in s1_fixed_length)
-    s2_length_max = max(len(s) for s in s2_fixed_length)
-    s1_fixed_width = [f"{s:<{s1_length_max}}" for s in s1_fixed_length]
-    s2_fixed_width = [f"{s:<{s2_length_max}}" for s in s2_fixed_length]
+    # Pad each individual string within each column to ensure they're equal,
+    # and join them with `sep`, in a single format per line (a width of
+    # 0 leaves the last column unpadded)
+    template = "%%-%ds%s%%-%ds" % (s1_length_max, sep.replace("%", "%%"), s2_length_max)
 
-    # Concatenate the two multiline strings
-    return "\n".join(sep.join(elem) for elem in zip(s1_fixed_width, s2_fixed_width))
+    # Concatenate the two multiline strings by interleaving their lines into
+    # a single flat list of pieces and formatting them all at once, which
+    # builds the result in one go instead of joining every line separately
+    pieces = [""] * (2 * height)
+    pieces[::2] = s1_fixed_length
+    pieces[1::2] = s2_fixed_length
+    return "\n".join([template] * height) % tuple(pieces)
+
+
+class Column(NamedTuple):
+    """
+    A multiline string split into its lines, each padded to the width of
+    the widest line, along with that width and a blank line just as wide
+    """
+
+    lines: Tuple[str, ...]
+    width: int
+    blank: str
+
+
+@lru_cache(maxsize=1024)
+def split_column(s: str) -> Column:
+    """
+    Splits a multiline string into a `Column`. Cached, since most
+    columns don't change between draws of the game
+    """
+
+    lines = s.split("\n")
+    width = max(map(len, lines))
+    return Column(tuple(line.ljust(width) for line in lines), width, " " * width)
 
 
 def multiline_concat_list(
     s: Iterable[str], merge_from_bottom: bool = True, sep: str = "    "
 ) -> str:
     """
-    Horizontally joins a list of multiline strings
+    Horizontally joins a list of multiline strings. Joining
+    no strings gives an empty string, and joining one gives it back
+    """
+
+    columns = tuple(s)
+    if len(columns) == 0:
+        return ""
+    if len(columns) == 1:
+        return columns[0]
+    return concat_columns(columns, merge_from_bottom, sep)
+
+
+# Redrawing an unchanged board or set of teams joins exactly the
+# same columns again
+@lru_cache(maxsize=256)
+def concat_columns(s: Tuple[str, ...], merge_from_bottom: bool, sep: str) -> str:
+    """
+    Horizontally joins a tuple of at least two multiline strings.
+    Cached, so the columns must be hashable
     """
 
-    return reduce(lambda x, y: multiline_concat(x, y, merge_from_bottom, sep), s)
+    # The last column isn't padded to its width, which would only
+    # end every row with trailing whitespace
+    columns = [split_column(column) for column in s[:-1]]
+    column_lines: List[Tuple[str, ...]] = [column.lines for column in columns]
+    column_lines.append(tuple(s[-1].split("\n")))
+    heights = list(map(len, column_lines))
+    height = max(heights)
 
+    # When every column is equally tall, no row needs padding
+    if min(heights) == height:
+        return "\n".join(map(sep.join, zip(*column_lines)))
+
+    # Pad number of lines in each column to ensure they're equal, then
+    # join every row with `sep` at once
+    blanks = [column.blank for column in columns]
+    blanks.append("")
+    padded_columns: List[Tuple[str, ...]] = []
+    for lines, blank in zip(column_lines, blanks):
+        padding = (blank,) * (height - len(lines))
+        if merge_from_bottom:
+            padded_columns.append(padding + lines)
+        else:
+            padded_columns.append(lines + padding)
+    rows = list(map(sep.join, zip(*padded_columns)))
+
+    # A row only some columns reach is blank (separators included) up to
+    # the separator before the first column that reaches it, just as if
+    # the columns had been joined one pair at a time. The padding is
+    # already blank, so this only matters for separators that aren't
+    if sep.strip(" ") != "":
+        start = 0
+        blank_width = -len(sep)
+        for row in range(height):
+            while heights[start] <= row:
+                blank_width += columns[start].width + len(sep)
+                start += 1
+            if start > 0:
+                # Rows are counted outwards from the side the columns
+                # are merged from
+                index = height - 1 - row if merge_from_bottom else row
+                rows[index] = " " * blank_width + rows[index][blank_width:]
+    return "\n".join(rows)
+
+
+def to_string(list_: Iterable[T]) -> List[str]:
+    """
+    Returns a list of the string of each element
+    """
 
-def to_string(list_: Iterable[T]) -> Iterable[str]:
-    return map(str, list_)
+    return list(map(str, list_))
@@ -0,0 +1,107 @@
+import random
+import unittest
+from copy import deepcopy
+from itertools import permutations
+from typing import Dict, Iterable, List
+
+from camelcalc.camelcalc import count_places, unpack_counts
+from camelcalc.camelup import BOARD_SPOTS, Color, Game, MovementCard, TeamName
+
+
+def build_game(
+    stacks: Dict[int, List[Color]], cards: Dict[int, bool], die: Iterable[Color]
+) -> Game:
+    """
+    Build a game with the camels on each spot (bottom to top), a movement
+    card on each spot in `cards` (True for forward), and the die remaining
+    """
+
+    game = Game(2)
+    for spot in game.spots:
+        spot.camels = []
+        spot.movement_card = None
+    for pos, colors in stacks.items():
+        game.spots[pos].camels = list(colors)
+        for color in colors:
+            game.camels[color].pos = pos
+    for pos, forward in cards.items():
+        game.spots[pos].movement_card = MovementCard(TeamName.A, forward)
+    game.die_remaining = set(die)
+    return game
+
+
+def brute_force_counts(game: Game) -> List[List[int]]:
+    """
+    Play out every order and roll of the remaining die on copies of the
+    game with `Game.move_camel`, and count how often each camel finishes
+    first, second, and third or worse
+    """
+
+    counts = [[0] * 3 for _ in Color]
+
+    # Once the race is over the rest of the die can't move anything,
+    # but their rolls still count as outcomes
+    def play(game: Game, die: List[Color]) -> None:
+        if len(die) == 0 or not game.is_playing():
+            for c, place in enumerate(game.get_positions()):
+                counts[c][min(place, 3) - 1] += 3 ** len(die)
+            return
+        for roll in range(1, 4):
+            rolled = deepcopy(game)
+            rolled.move_camel(die[0], roll)
+            play(rolled, die[1:])
+
+    for order in permutations(game.die_remaining):
+        play(game, list(order))
+    return counts
+
+
+def random_game(rng: random.Random) -> Game:
+    """
+    Build a random game near the finish line, with movement cards on
+    empty spots that aren't next to another movement card
+    """
+
+    stacks: Dict[int, List[Color]] = {}
+    colors = list(Color)
+    rng.shuffle(colors)
+    for color in colors:
+        stacks.setdefault(rng.randint(BOARD_SPOTS - 8, BOARD_SPOTS), []).append(color)
+    cards: Dict[int, bool] = {}
+    for _ in range(rng.randint(0, 3)):
+        pos = rng.randint(1, BOARD_SPOTS)
+        if pos in stacks or {pos - 1, pos, pos + 1} & cards.keys():
+            continue
+        cards[pos] = rng.random() < 0.5
+    die = rng.sample(list(Color), rng.randint(1, 3))
+    return build_game(stacks, cards, die)
+
+
+class CountPlacesTest(unittest.TestCase):
+    def assert_matches_game(self, game: Game) -> None:
+        expected = brute_force_counts(game)
+        self.assertEqual(unpack_counts(count_places(*game.canonical_key())), expected)
+
+    def test_backward_card_on_last_spot(self) -> None:
+        # A camel crossing the finish line still takes the backward card
+        # on the last spot, like `Game.move_camel`
+        game = build_game(
+            {
+                0: [Color.YELLOW, Color.WHITE],
+                10: [Color.ORANGE],
+                13: [Color.GREEN],
+                14: [Color.BLUE],
+            },
+            {15: False},
+            [Color.GREEN, Color.BLUE, Color.ORANGE],
+        )
+        self.assert_matches_game(game)
+
+    def test_random_games(self) -> None:
+        rng = random.Random(0)
+        for _ in range(100):
+            self.assert_matches_game(random_game(rng))
+
+
+if __name__ == "__main__":
+    unittest.main()